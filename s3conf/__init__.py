@@ -1,3 +1 @@
-from . import patch
-
 __version__ = '0.10.2'
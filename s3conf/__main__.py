@@ -1,6 +1,12 @@
 import os
 import sys
-from .client import main as _main
+
+from . import __version__
+from ._help import HELP, PROG_PLACEHOLDER
+
+# --help, --version and calls with no arguments are answered without importing click
+# and the rest of the client, they are the most common invocations and do not need it
+VERSION = '{prog}, version {version}\n'
 
 
 def main():
@@ -11,6 +17,15 @@ def main():
     if entrypoint_name == '__main__.py':
         entrypoint_name = 's3conf'
 
+    args = sys.argv[1:]
+    if not args or args == ['--help']:
+        sys.stdout.write(HELP.replace(PROG_PLACEHOLDER, entrypoint_name))
+        sys.exit(0)
+    if args == ['--version']:
+        sys.stdout.write(VERSION.format(prog=entrypoint_name, version=__version__))
+        sys.exit(0)
+
+    from .client import main as _main
     _main(prog_name=entrypoint_name)
 
 
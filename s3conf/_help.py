@@ -0,0 +1,29 @@
+# Generated by "python -m s3conf._help_regen", do not edit.
+# Used by __main__.py to answer --help without importing click.
+PROG_PLACEHOLDER = '{prog}'
+
+HELP = """\
+Usage: {prog} [OPTIONS] COMMAND [ARGS]...
+
+  Simple command line tool to help manage environment variables stored in a
+  S3-like system. Facilitates editing text files remotely stored, as well as
+  downloading and uploading files.
+
+Options:
+  --version            Show the version and exit.
+  -e, --edit
+  -v, --verbosity LVL  Either CRITICAL, ERROR, WARNING, INFO or DEBUG
+  --help               Show this message and exit.
+
+Commands:
+  add    Add a mapping to the S3CONF_MAP variable for the given SECTION...
+  env    Reads the file defined by the S3CONF variable and output its...
+  exec   Sets the process environemnt and executes the [COMMAND] in the
+         same...
+
+  init   Creates the .s3conf config folder and .s3conf/config config file...
+  push   Upload files mapped in S3CONF_MAP variable defined in s3conf.ini...
+  rm     Removes the mapping in the S3CONF_MAP variable for the given...
+  set    Set value of a variable in an environment file for the given...
+  unset  Unset a variable in an environment file for the given section.
+"""
@@ -0,0 +1,40 @@
+"""
+Regenerates s3conf/_help.py from the click command tree. Run it after changing commands or options:
+
+    python -m s3conf._help_regen
+"""
+import os
+
+import click
+
+from .client import main
+
+HELP_FILE = os.path.join(os.path.dirname(__file__), '_help.py')
+PROG_PLACEHOLDER = '{prog}'
+
+TEMPLATE = '''# Generated by "python -m s3conf._help_regen", do not edit.
+# Used by __main__.py to answer --help without importing click.
+PROG_PLACEHOLDER = {placeholder!r}
+
+HELP = """\\
+{help}
+"""
+'''
+
+
+def render_help():
+    # same width click uses when the output is not a terminal
+    ctx = click.Context(main, info_name=PROG_PLACEHOLDER, terminal_width=78)
+    return main.get_help(ctx)
+
+
+def main_regen():
+    with open(HELP_FILE, 'w') as f:
+        f.write(TEMPLATE.format(
+            placeholder=PROG_PLACEHOLDER,
+            help=render_help().replace('\\', '\\\\'),
+        ))
+
+
+if __name__ == '__main__':
+    main_regen()
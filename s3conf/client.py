@@ -1,19 +1,30 @@
 import logging
-import subprocess
-import shlex
 import os
-from pathlib import Path
+import sys
 
 import click
 import click_log
 from click.exceptions import UsageError, MissingParameter
 
-from . import s3conf, config, __version__
+from . import patch, config, __version__
 from .exceptions import EnvfilePathNotDefinedError, EnvfilePathNotDefinedUsageError
 from .storage.exceptions import FileDoesNotExist
 
 logger = logging.getLogger(__name__)
 
+# the handlers only need to be set once per process, even if main is invoked several times
+_LOG_CONFIGURED = False
+
+# options shared by more than one command
+edit_option = click.option('--edit',
+                           '-e',
+                           is_flag=True)
+map_files_option = click.option('--map-files',
+                                '-m',
+                                is_flag=True,
+                                help='If defined, tries to map files from the storage to the local drive as defined '
+                                     'by the variable S3CONF_MAP read from the S3CONF file.')
+
 
 class SectionArgument(click.Argument):
     def handle_parse_result(self, *args, **kwargs):
@@ -25,7 +36,7 @@ class SectionArgument(click.Argument):
 
 @click.group(invoke_without_command=True)
 @click.version_option(version=__version__)
-@click.option('--edit', '-e', is_flag=True)
+@edit_option
 @click.pass_context
 # this sets the log level for this app only
 @click_log.simple_verbosity_option('s3conf')
@@ -35,13 +46,17 @@ def main(ctx, edit):
     files remotely stored, as well as downloading and uploading files.
     """
     # configs this module logger to behave properly
-    # logger messages will go to stderr (check __init__.py/patch.py)
+    # logger messages will go to stderr (check patch.py)
     # client output should be generated with click.echo() to go to stdout
+    global _LOG_CONFIGURED
     try:
-        click_log.basic_config('s3conf')
+        if not _LOG_CONFIGURED:
+            click_log.basic_config('s3conf')
+            _LOG_CONFIGURED = True
         logger.debug('Running main entrypoint')
         if edit:
             if ctx.invoked_subcommand is None:
+                from . import s3conf
                 settings = config.Settings()
                 conf = s3conf.S3Conf(settings=settings)
                 logger.debug('Using config file %s', settings.config_file)
@@ -61,11 +76,7 @@ def main(ctx, edit):
 @main.command('env')
 @click.argument('section',
                 required=False)
-@click.option('--map-files',
-              '-m',
-              is_flag=True,
-              help='If defined, tries to map files from the storage to the local drive as defined by '
-                   'the variable S3CONF_MAP read from the S3CONF file.')
+@map_files_option
 @click.option('--phusion',
               is_flag=True,
               help='If set, dumps variables to --dump-path in for format used by the phusion docker image. '
@@ -78,9 +89,7 @@ def main(ctx, edit):
               '-q',
               is_flag=True,
               help='Do not print any environment variables output.')
-@click.option('--edit',
-              '-e',
-              is_flag=True)
+@edit_option
 @click.option('--create',
               '-c',
               is_flag=True,
@@ -90,6 +99,7 @@ def env(section, map_files, phusion, phusion_path, quiet, edit, create):
     Reads the file defined by the S3CONF variable and output its contents to stdout. Logs are printed to stderr.
     See options for added functionality: editing file, mapping files, dumping in the phusion-baseimage format, etc.
     """
+    from . import s3conf
     try:
         logger.debug('Running env command')
         settings = config.Settings(section=section)
@@ -102,12 +112,15 @@ def env(section, map_files, phusion, phusion_path, quiet, edit, create):
                 conf.edit_envfile()
         else:
             with conf.get_envfile() as env_file:
+                # nothing consumes the variables, the file is still fetched so a missing one is reported
+                if quiet and not phusion and not map_files:
+                    return
                 env_vars = env_file.as_dict()
             if map_files:
                 conf.pull()
-            if not quiet:
-                for var_name, var_value in sorted(env_vars.items(), key=lambda x: x[0]):
-                    click.echo('{}={}'.format(var_name, var_value))
+            if not quiet and env_vars:
+                # a single write instead of one per variable
+                click.echo('\n'.join(f'{var_name}={var_value}' for var_name, var_value in sorted(env_vars.items())))
             if phusion:
                 s3conf.phusion_dump(env_vars, phusion_path)
     except EnvfilePathNotDefinedError:
@@ -116,6 +129,20 @@ def env(section, map_files, phusion, phusion_path, quiet, edit, create):
         raise UsageError('The file {} does not exist. Try "-c" option if you want to create it.'.format(str(e)))
 
 
+def _is_outside(relative_path):
+    return relative_path == os.pardir or relative_path.startswith(os.pardir + os.sep)
+
+
+def _path_from_root(settings, local_path):
+    # abspath is plain string handling, symlinks only need resolving when the path seems to be outside the root
+    relative_path = os.path.relpath(os.path.abspath(local_path), settings.root_folder)
+    if _is_outside(relative_path):
+        relative_path = os.path.relpath(os.path.realpath(local_path), settings.root_folder)
+    if _is_outside(relative_path):
+        raise UsageError(f'{local_path} is outside the project root {settings.root_folder}')
+    return relative_path
+
+
 @main.command('add')
 @click.argument('section', cls=SectionArgument)
 @click.argument('local_path')
@@ -126,10 +153,10 @@ def add(section, local_path):
     """
     try:
         settings = config.Settings(section=section)
-        local_path = Path(local_path).resolve().relative_to(settings.root_folder)
-        remote_path = os.path.join(os.path.dirname(settings.environment_file_path), 'files', str(local_path))
-        settings.add_mapping(remote_path, str(local_path))
-        config_file = config.ConfigFileResolver(settings.config_file, section=section)
+        local_path = _path_from_root(settings, local_path)
+        remote_path = os.path.join(os.path.dirname(settings.environment_file_path), 'files', local_path)
+        settings.add_mapping(remote_path, local_path)
+        config_file = settings.primary_resolver
         config_file.set('S3CONF_MAP', settings.serialize_mappings())
         config_file.save()
     except EnvfilePathNotDefinedError:
@@ -145,9 +172,9 @@ def rm(section, local_path):
     """
     try:
         settings = config.Settings(section=section)
-        local_path = Path(local_path).resolve().relative_to(settings.root_folder)
-        settings.rm_mapping(str(local_path))
-        config_file = config.ConfigFileResolver(settings.config_file, section=section)
+        local_path = _path_from_root(settings, local_path)
+        settings.rm_mapping(local_path)
+        config_file = settings.primary_resolver
         config_file.set('S3CONF_MAP', settings.serialize_mappings())
         config_file.save()
     except EnvfilePathNotDefinedError:
@@ -165,6 +192,7 @@ def push(section, force):
     Stores the md5 hash for uploaded files in local cache. If the remote file md5 hash differs
     from the value we have in our cache, the upload fails unless forced.
     """
+    from . import s3conf
     try:
         settings = config.Settings(section=section)
         conf = s3conf.S3Conf(settings=settings)
@@ -173,12 +201,32 @@ def push(section, force):
         raise EnvfilePathNotDefinedUsageError()
 
 
+def _spawn_and_wait(argv, env):
+    # like a shell, a child killed by a signal is reported as 128 + the signal number
+    if not hasattr(os, 'posix_spawnp'):
+        import subprocess
+        returncode = subprocess.run(argv, env=env).returncode
+        return 128 - returncode if returncode < 0 else returncode
+    import signal
+    # subprocess only uses posix_spawn for commands given with a full path and with close_fds=False,
+    # so we call it directly, restoring the signals python ignores as subprocess would
+    pid = os.posix_spawnp(argv[0], argv, env, setsigdef=(signal.SIGPIPE, signal.SIGXFSZ))
+    while True:
+        try:
+            _, status = os.waitpid(pid, 0)
+            break
+        except KeyboardInterrupt:
+            # a Ctrl-C from the terminal reaches the whole foreground process group, so the child got it too
+            # it is not forwarded, a second SIGINT makes some programs skip their graceful shutdown
+            # a SIGINT sent to s3conf alone never reaches the child, we keep waiting for it either way
+            continue
+    if os.WIFSIGNALED(status):
+        return 128 + os.WTERMSIG(status)
+    return os.WEXITSTATUS(status)
+
+
 @main.command('exec')
-@click.option('--map-files',
-              '-m',
-              is_flag=True,
-              help='If defined, tries to map files from the storage to the local drive as defined by '
-                   'the variable S3CONF_MAP read from the S3CONF file.')
+@map_files_option
 @click.argument('section',
                 required=False)
 # to use option-like arguments use "--"
@@ -187,8 +235,13 @@ def push(section, force):
                 required=False,
                 nargs=-1,
                 type=click.UNPROCESSED)
+@click.option('--no-exec-replace',
+              'no_exec_replace',
+              is_flag=True,
+              help='Run [COMMAND] as a child process, keeping s3conf alive until it exits. Signals sent to '
+                   's3conf are not forwarded, only those the terminal sends to both processes reach the child.')
 @click.pass_context
-def exec_command(ctx, section, command, map_files):
+def exec_command(ctx, section, command, map_files, no_exec_replace):
     """
     Sets the process environemnt and executes the [COMMAND] in the same context. Does not modify the current shell
     environment.
@@ -198,9 +251,9 @@ def exec_command(ctx, section, command, map_files):
 
     s3conf -v info exec dev -- ping -v google.com
     """
+    from . import s3conf
     try:
         logger.debug('Running exec command')
-        command = ' '.join(command)
 
         if not command:
             logger.warning('No command detected.')
@@ -216,8 +269,16 @@ def exec_command(ctx, section, command, map_files):
 
         current_env = os.environ.copy()
         current_env.update(env_vars)
-        logger.debug('Executing command "%s"', command)
-        subprocess.run(shlex.split(command), env=current_env, check=True)
+        # click already gives us the tokenized argv, joining and splitting it again would lose any quoting
+        argv = list(command)
+        logger.debug('Executing command "%s"', ' '.join(argv))
+        if no_exec_replace:
+            ctx.exit(_spawn_and_wait(argv, current_env))
+        # there is nothing left to do after the command runs, so we replace this process with it
+        # instead of forking a child and waiting for it, its exit code becomes ours
+        sys.stdout.flush()
+        sys.stderr.flush()
+        os.execvpe(argv[0], argv, current_env)
     except EnvfilePathNotDefinedError:
         raise EnvfilePathNotDefinedUsageError()
 
@@ -234,6 +295,7 @@ def set_variable(section, value):
 
     s3conf set test ENV_VAR_NAME=env_var_value
     """
+    from . import s3conf
     if not value:
         value = section
         section = None
@@ -259,6 +321,7 @@ def unset_variable(section, value):
 
     s3conf unset test ENV_VAR_NAME
     """
+    from . import s3conf
     if not value:
         value = section
         section = None
@@ -284,9 +347,10 @@ def init(section, remote_file):
 
     s3conf init development s3://my-project/development.env
     """
+    from . import s3conf
     logger.debug('Running init command')
     settings = config.Settings(section=section)
-    config_file = config.ConfigFileResolver(settings.config_file, section=section)
+    config_file = settings.primary_resolver
     config_file.set('S3CONF', remote_file)
     config_file.save()
     conf = s3conf.S3Conf(settings=settings)
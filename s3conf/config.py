@@ -1,5 +1,7 @@
 import os
+import copy
 import logging
+from functools import lru_cache
 from configobj import ConfigObj
 from pathlib import Path
 
@@ -12,21 +14,46 @@ logger = logging.getLogger(__name__)
 CONFIG_NAME = 's3conf'
 
 
+@lru_cache(maxsize=8)
+def _find_root_folder(current_path):
+    config_file_name = f'{CONFIG_NAME}.ini'
+    while True:
+        if os.path.isfile(os.path.join(current_path, config_file_name)):
+            return current_path
+        parent_path = os.path.dirname(current_path)
+        if parent_path == current_path:
+            return None
+        current_path = parent_path
+
+
 def _lookup_root_folder(current_path='.'):
-    current_path = Path(current_path).resolve()
-    # recursion stops
-    if not current_path or current_path == Path(current_path.anchor):
+    # walking up the tree with a single stat per level, instead of listing every folder
+    # the walk is cached per starting folder, config files we save ourselves clear the cache
+    root_folder = _find_root_folder(os.path.realpath(current_path))
+    if root_folder is None:
         root_folder = Path('.')
-        logger.debug('Root folder detected: %s', root_folder)
-        return root_folder
-    path_items = {entry.name: entry for entry in os.scandir(current_path)}
-    config_file_name = f'{CONFIG_NAME}.ini'
-    if config_file_name in path_items:
-        entry = path_items[config_file_name]
-        if entry.is_file():
-            logger.debug('Root folder detected: %s', current_path)
-            return str(current_path)
-    return _lookup_root_folder(current_path.parent)
+    logger.debug('Root folder detected: %s', root_folder)
+    return root_folder
+
+
+# parsed config files shared by all resolvers of the same file in this process
+# entries are validated against the file mtime and size, so edits are picked up
+_PARSE_CACHE = {}
+
+
+def _parse_config_file(config_file):
+    try:
+        stat = os.stat(config_file)
+    except FileNotFoundError:
+        return ConfigObj(config_file)
+    signature = (stat.st_mtime_ns, stat.st_size)
+    key = os.path.abspath(config_file)
+    cached = _PARSE_CACHE.get(key)
+    if cached and cached[0] == signature:
+        return cached[1]
+    config = ConfigObj(config_file)
+    _PARSE_CACHE[key] = (signature, config)
+    return config
 
 
 class EnvironmentResolver:
@@ -39,22 +66,33 @@ class EnvironmentResolver:
 
 class ConfigFileResolver:
     def __init__(self, config_file, section=None):
-        self.config_file = config_file
+        self.config_file = str(config_file)
         self.section = section or 'DEFAULT'
         self._config = None
+        self._writable = False
 
     def __str__(self):
         return f'{self.config_file}:{self.section}'
 
     @property
     def config(self):
-        if not self._config:
-            self._config = ConfigObj(str(self.config_file))
+        # an empty ConfigObj is falsy, missing or empty files are only parsed once too
+        if self._config is None and not self._writable:
+            self._config = _parse_config_file(self.config_file)
         return self._config
 
     @config.setter
     def config(self, value):
         self._config = value
+        self._writable = True
+
+    def _writable_config(self):
+        # a private copy of the parse this resolver already holds, instead of reading the file again
+        # the shared one may be held by other resolvers, they must not see changes that were never saved
+        if not self._writable:
+            self._config = copy.deepcopy(self.config)
+            self._writable = True
+        return self._config
 
     def get(self, item, default=None, section=None):
         try:
@@ -63,10 +101,14 @@ class ConfigFileResolver:
             return default
 
     def set(self, item, value, section=None):
-        self.config.setdefault(section or self.section, {})[item] = value
+        self._writable_config().setdefault(section or self.section, {})[item] = value
 
     def save(self):
-        self.config.write()
+        self._writable_config().write()
+        # mtime resolution might not be enough to detect our own write
+        _PARSE_CACHE.pop(os.path.abspath(self.config_file), None)
+        # a new config file may change where the project root is
+        _find_root_folder.cache_clear()
 
     def sections(self):
         return list(self.config)
@@ -75,40 +117,54 @@ class ConfigFileResolver:
 class Settings:
     def __init__(self, section=None, config_file=None):
         if config_file:
-            config_file = Path(config_file).resolve()
-            root_folder = Path(config_file).parent
+            self.config_file = os.path.realpath(config_file)
+            self.root_folder = os.path.dirname(self.config_file)
         else:
-            root_folder = Path(_lookup_root_folder()).resolve()
-            config_file = root_folder.joinpath(f'{CONFIG_NAME}.ini')
-        self.root_folder = str(root_folder)
-        self.config_file = str(config_file)
-        cache_dir = root_folder.joinpath(f'.{CONFIG_NAME}')
-        self.cache_dir = str(cache_dir)
-        self.hash_file = str(cache_dir.joinpath('remote_hashes'))
-        self.default_config_file = str(cache_dir.joinpath('default.ini'))
+            root_folder = _lookup_root_folder()
+            # a detected root is already resolved, only the current folder fallback is not
+            self.root_folder = root_folder if os.path.isabs(root_folder) else os.path.realpath(root_folder)
+            self.config_file = os.path.join(self.root_folder, f'{CONFIG_NAME}.ini')
+        # with a trailing separator, even if the root is "/"
+        self._root_prefix = os.path.join(self.root_folder, '')
+        self.cache_dir = os.path.join(self.root_folder, f'.{CONFIG_NAME}')
+        self.hash_file = os.path.join(self.cache_dir, 'remote_hashes')
+        self.default_config_file = os.path.join(self.cache_dir, 'default.ini')
         self.section = section
-        logger.debug('Settings paths:\n%s\n%s\n%s\n%s',
-                     self.root_folder,
-                     self.config_file,
-                     self.cache_dir,
-                     self.default_config_file)
-
-        if self.section:
-            self.resolvers = [
-                ConfigFileResolver(self.config_file, self.section),
-                EnvironmentResolver(),
-                ConfigFileResolver(self.default_config_file),
-            ]
-        else:
-            self.resolvers = [
-                EnvironmentResolver(),
-                ConfigFileResolver(self.config_file, self.section),
-                ConfigFileResolver(self.default_config_file),
-            ]
-
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug('Settings paths:\n%s\n%s\n%s\n%s',
+                         self.root_folder,
+                         self.config_file,
+                         self.cache_dir,
+                         self.default_config_file)
+
+        self._resolvers = None
         self._environment_file_path = None
         self._file_mappings = None
 
+    @property
+    def resolvers(self):
+        # resolvers are only built when first needed, some commands only use the settings paths
+        if self._resolvers is None:
+            if self.section:
+                self._resolvers = [
+                    ConfigFileResolver(self.config_file, self.section),
+                    EnvironmentResolver(),
+                ]
+            else:
+                self._resolvers = [
+                    EnvironmentResolver(),
+                    ConfigFileResolver(self.config_file, self.section),
+                ]
+            # the default config only exists after init, without it every miss would end in an empty parse
+            if os.path.exists(self.default_config_file):
+                self._resolvers.append(ConfigFileResolver(self.default_config_file))
+        return self._resolvers
+
+    @property
+    def primary_resolver(self):
+        # the resolver reading the section of the project config file
+        return self.resolvers[0] if self.section else self.resolvers[1]
+
     @property
     def environment_file_path(self):
         # resolving environment file path
@@ -122,41 +178,45 @@ class Settings:
     @property
     def file_mappings(self):
         if self._file_mappings is None:
-            self._file_mappings = {}
             files_list = self.get('S3CONF_MAP')
             files_pairs = files_list.split(';') if files_list else []
+            file_mappings = {}
             for file_map in files_pairs:
                 remote_path, _, local_path = file_map.rpartition(':')
                 if remote_path and local_path:
-                    self.add_mapping(remote_path, local_path)
+                    file_mappings[self.path_from_root(local_path)] = remote_path
+            self._file_mappings = file_mappings
         return self._file_mappings
 
+    def path_from_root(self, file_path):
+        # absolute paths are taken as relative to the project root
+        # normalised like pathlib does: empty and "." parts are dropped, ".." is kept as written
+        parts = [part for part in file_path.split('/') if part and part != '.']
+        if not parts:
+            return self.root_folder
+        return self._root_prefix + '/'.join(parts)
+
     def add_mapping(self, remote_path, local_path):
-        local_path = Path(local_path)
-        local_path = Path(self.root_folder).joinpath(local_path.relative_to(local_path.root))
-        self.file_mappings[str(local_path)] = remote_path
+        self.file_mappings[self.path_from_root(local_path)] = remote_path
 
     def rm_mapping(self, local_path):
-        local_path = Path(local_path)
-        local_path = Path(self.root_folder).joinpath(local_path.relative_to(local_path.root))
-        del self.file_mappings[str(local_path)]
+        del self.file_mappings[self.path_from_root(local_path)]
 
     def serialize_mappings(self):
-        file_mappings = {}
-        for local_path, remote_path in self.file_mappings.items():
-            relative_local_path = Path(local_path).relative_to(self.root_folder)
-            file_mappings[str(relative_local_path)] = remote_path
-        return ';'.join(f'{remote_path}:{local_path}' for local_path, remote_path in file_mappings.items())
+        # every key was built by path_from_root, so removing the root prefix gives back the relative path
+        # the root itself has no prefix to remove and is written as "."
+        prefix_length = len(self._root_prefix)
+        return ';'.join(f'{remote_path}:{local_path[prefix_length:] or "."}'
+                        for local_path, remote_path in self.file_mappings.items())
 
     def __getitem__(self, item):
         for resolver in self.resolvers:
             value = resolver.get(item)
             if value:
-                break
-        else:
-            raise KeyError()
-        logger.debug('Entry %s has value %s found in %s', item, value, str(resolver))
-        return value
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug('Entry %s has value %s found in %s', item, value, str(resolver))
+                return value
+        raise KeyError(item)
 
     def get(self, item, default=None):
         try:
@@ -7,20 +7,28 @@ class EnvfilePathNotDefinedUsageError(UsageError):
         if message:
             message += '\n'
         super().__init__(message, *args, **kwargs)
-
-        error_msg = 'Set the environemnt variable S3CONF or provide a section from an existing config file.'
-        try:
-            from . import config
-            sections_detected = ''
-            settings = config.Settings()
-            for section in config.ConfigFileResolver(settings.config_file).sections():
-                sections_detected += '    {}\n'.format(section)
-        except (FileNotFoundError, ImportError):
-            pass
-        if sections_detected:
-            sections_detected = '\n\nThe following sections were detected:\n\n' + sections_detected
-
-        self.message += error_msg + sections_detected
+        self._formatted_message = None
+
+    def format_message(self):
+        # the config file is only read to list its sections when the error is actually shown
+        if self._formatted_message is None:
+            error_msg = 'Set the environemnt variable S3CONF or provide a section from an existing config file.'
+            try:
+                from . import config
+                sections_detected = ''
+                settings = config.Settings()
+                for section in config.ConfigFileResolver(settings.config_file).sections():
+                    sections_detected += '    {}\n'.format(section)
+            except (FileNotFoundError, ImportError):
+                pass
+            if sections_detected:
+                sections_detected = '\n\nThe following sections were detected:\n\n' + sections_detected
+
+            self._formatted_message = self.message + error_msg + sections_detected
+        return self._formatted_message
+
+    def __str__(self):
+        return self.format_message()
 
 
 class LocalCopyOutdated(UsageError):
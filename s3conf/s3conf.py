@@ -1,3 +1,4 @@
+import os
 import codecs
 import logging
 import json
@@ -27,11 +28,14 @@ def parse_dotenv(data):
 
 
 def phusion_dump(environment, path):
-    path = Path(path)
-    path.mkdir(parents=True, exist_ok=True)
+    os.makedirs(path, exist_ok=True)
+    # one unbuffered write per variable, the values are small and we do not need the file object machinery
     for k, v in environment.items():
-        with open(path.joinpath(k), 'w') as f:
-            f.write(v + '\n')
+        fd = os.open(os.path.join(path, k), os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o666)
+        try:
+            os.write(fd, (v + '\n').encode())
+        finally:
+            os.close(fd)
 
 
 def raise_out_of_sync(local_file, remote_file):
@@ -112,7 +116,7 @@ class S3Conf:
         logger.info('Loading configs from %s', self.settings.environment_file_path)
         remote_storage = self.storages.storage(self.settings.environment_file_path)
         _, _, path = partition_path(self.settings.environment_file_path)
-        return EnvFile.from_file(remote_storage.open(path, mode=mode))
+        return remote_storage.open(path, mode=mode, file_class=EnvFile)
 
     def edit_envfile(self):
         with self.get_envfile(mode='r+') as envfile:
@@ -123,7 +127,7 @@ class S3Conf:
         remote_storage = self.storages.storage(self.settings.environment_file_path)
         remote_storage.create_bucket()
         _, _, path = partition_path(self.settings.environment_file_path)
-        envfile_exist = bool(list(remote_storage.list(path)))
+        envfile_exist = remote_storage.stat(path) is not None
         if envfile_exist:
             logger.warning('%s already exist', self.settings.environment_file_path)
         else:
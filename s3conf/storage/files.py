@@ -18,6 +18,8 @@ class File:
         self.encoding = encoding
         self._buffer = None
         self._file = None
+        # set when the local copy is known to match the storage, so closing it does not write it back
+        self._clean = False
 
     def _sync_with_storage(self):
         if 'w' not in self.mode:
@@ -31,12 +33,15 @@ class File:
 
     # IOBase
     def flush(self) -> None:
-        if self.file.writable():
+        if self.file.writable() and not self._clean:
             self.file.flush()
             self._buffer.seek(0)
             logger.debug('Writing buffer to %s', self.name)
             self.storage.write(self._buffer, self.name)
 
+    def mark_clean(self):
+        self._clean = True
+
     # IOBase
     def close(self) -> None:
         if not self.closed:
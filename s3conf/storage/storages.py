@@ -5,6 +5,7 @@ from io import BytesIO
 from pathlib import Path
 from tempfile import TemporaryFile
 from shutil import copyfileobj
+from stat import S_ISREG
 from functools import lru_cache
 
 from .files import File
@@ -15,7 +16,28 @@ EXTRAS = []
 try:
     import boto3
     from botocore.exceptions import ClientError
+    from botocore.awsrequest import AWSConnection
+    from botocore.client import Config
+    from boto3.s3.transfer import TransferConfig
     EXTRAS.append(boto3)
+
+    # Solving 2 year old boto issue regarding empty file uploads
+    # https://github.com/boto/botocore/pull/1328
+    # patched here instead of in patch.py so botocore is only loaded when a storage is actually needed
+    _original_send_request = AWSConnection._send_request
+
+
+    def _new_send_request(self, method, url, body, headers, *args, **kwargs):
+        if headers.get('Content-Length') == '0':
+            # From RFC: https://tools.ietf.org/html/rfc7231#section-5.1.1
+            # Requirement for clients:
+            # - A client MUST NOT generate a 100-continue expectation
+            #   in a request that does not include a message body.
+            headers.pop('Expect', None)
+        return _original_send_request(self, method, url, body, headers, *args, **kwargs)
+
+
+    AWSConnection._send_request = _new_send_request
 except ImportError:
     pass
 
@@ -32,6 +54,20 @@ if not EXTRAS:
 
 logger = logging.getLogger(__name__)
 
+# transfers run in thread pools, botocore's default pool of 10 connections would make
+# the extra workers discard and re-open connections
+S3_MAX_POOL_CONNECTIONS = 64
+S3_CONNECT_TIMEOUT = 10
+S3_READ_TIMEOUT = 60
+# the multipart settings must match the ones used by s3etag() to compute the ETags of local files,
+# otherwise every upload would produce a different ETag and files would never be seen as in sync
+S3_MULTIPART_THRESHOLD = 8 * 1024 * 1024
+S3_MULTIPART_CHUNKSIZE = 8 * 1024 * 1024
+S3_MAX_CONCURRENCY = 16
+S3_IO_CHUNKSIZE = 1024 * 1024
+# streams are copied in chunks this large instead of shutil's default, fewer reads and writes per file
+COPY_BUFFER_SIZE = 1024 * 1024
+
 
 def strip_prefix(text, prefix):
     return text[len(prefix):] if text.startswith(prefix) else text
@@ -47,9 +83,10 @@ class BaseStorage:
     def read_into_stream(self, path, stream=None):
         raise NotImplementedError()
 
-    def open(self, path, mode='rb', encoding=None):
+    def open(self, path, mode='rb', encoding=None, file_class=None):
         logger.debug('Reading from %s', path)
-        return self.file_class(path, storage=self, mode=mode, encoding=encoding)
+        file_class = file_class or self.file_class
+        return file_class(path, storage=self, mode=mode, encoding=encoding)
 
     def create_bucket(self):
         raise NotImplementedError()
@@ -60,15 +97,54 @@ class BaseStorage:
     def list(self, path):
         raise NotImplementedError()
 
+    def stat(self, path):
+        """
+        Returns a (hash, size) tuple for the file at path, or None if it does not exist.
+        Unlike list(), only that exact path is checked.
+        """
+        raise NotImplementedError()
+
+
+@lru_cache()
+def get_s3_transfer_config():
+    return TransferConfig(
+        multipart_threshold=S3_MULTIPART_THRESHOLD,
+        multipart_chunksize=S3_MULTIPART_CHUNKSIZE,
+        max_concurrency=S3_MAX_CONCURRENCY,
+        io_chunksize=S3_IO_CHUNKSIZE,
+    )
+
 
 @lru_cache()
-def get_s3_bucket(_storage, bucket):
-    return _storage.s3.Bucket(bucket)
+def get_s3_resource(aws_access_key_id=None,
+                    aws_secret_access_key=None,
+                    aws_session_token=None,
+                    region_name=None,
+                    use_ssl=None,
+                    endpoint_url=None,
+                    max_pool_connections=None):
+    # storages pointing to different buckets with the same credentials share one resource,
+    # avoiding a new session, client and connection pool for each of them
+    logger.debug('Creating a new S3 resource')
+    return boto3.resource(
+        's3',
+        aws_access_key_id=aws_access_key_id,
+        aws_secret_access_key=aws_secret_access_key,
+        aws_session_token=aws_session_token,
+        region_name=region_name,
+        use_ssl=use_ssl,
+        endpoint_url=endpoint_url,
+        config=Config(
+            max_pool_connections=max_pool_connections or S3_MAX_POOL_CONNECTIONS,
+            connect_timeout=S3_CONNECT_TIMEOUT,
+            read_timeout=S3_READ_TIMEOUT,
+        ),
+    )
 
 
 def s3etag(file_like,
-           multipart_threshold=8 * 1024 * 1024,
-           multipart_chunksize=8 * 1024 * 1024):
+           multipart_threshold=S3_MULTIPART_THRESHOLD,
+           multipart_chunksize=S3_MULTIPART_CHUNKSIZE):
     """
     Returns the md5 hash that will match the ETag in S3
     https://stackoverflow.com/questions/6591047/etag-definition-changed-in-amazon-s3/28877788#28877788
@@ -106,6 +182,7 @@ class S3Storage(BaseStorage):
                  region_name=None,
                  use_ssl=None,
                  endpoint_url=None,
+                 max_pool_connections=None,
                  bucket=None,
                  **kwargs):
         super().__init__(**kwargs)
@@ -116,6 +193,7 @@ class S3Storage(BaseStorage):
         self.region_name = region_name
         self.use_ssl = use_ssl
         self.endpoint_url = endpoint_url
+        self.max_pool_connections = int(max_pool_connections) if max_pool_connections else None
         self._resource = None
         self.hash_method = s3etag
 
@@ -125,28 +203,29 @@ class S3Storage(BaseStorage):
         # See how boto resolve credentials in
         # http://boto3.readthedocs.io/en/latest/guide/configuration.html#guide-configuration
         if not self._resource:
-            logger.debug('Resource does not exist, creating a new one...')
-            self._resource = boto3.resource(
-                's3',
+            logger.debug('Resource does not exist, getting a shared one...')
+            self._resource = get_s3_resource(
                 aws_access_key_id=self.aws_access_key_id,
                 aws_secret_access_key=self.aws_secret_access_key,
                 aws_session_token=self.aws_session_token,
                 region_name=self.region_name,
                 use_ssl=self.use_ssl,
                 endpoint_url=self.endpoint_url,
+                max_pool_connections=self.max_pool_connections,
             )
         return self._resource
 
     def read_into_stream(self, path, stream=None):
         try:
             stream = stream or BytesIO()
-            bucket = get_s3_bucket(self, self.bucket)
-            bucket.download_fileobj(path, stream)
+            # using the client instead of the bucket resource, clients are thread safe
+            # https://boto3.amazonaws.com/v1/documentation/api/latest/guide/resources.html#multithreading-or-multiprocessing-with-resources
+            self.s3.meta.client.download_fileobj(self.bucket, path, stream, Config=get_s3_transfer_config())
             stream.seek(0)
             return stream
         except ClientError as e:
             if e.response['Error']['Code'] == '404':
-                logger.debug('File %s in bucket %s does not exist', path, bucket)
+                logger.debug('File %s in bucket %s does not exist', path, self.bucket)
                 raise exceptions.FileDoesNotExist('s3://{}/{}'.format(self.bucket, path))
             else:
                 raise
@@ -156,29 +235,41 @@ class S3Storage(BaseStorage):
 
     def write(self, f, path):
         logger.debug('Writing to %s', path)
-        bucket = get_s3_bucket(self, self.bucket)
         # boto3 closes the handler, creating a copy
         # https://github.com/boto/s3transfer/issues/80
         with TemporaryFile() as file_to_close:
             f.seek(0)
-            copyfileobj(f, file_to_close)
+            copyfileobj(f, file_to_close, COPY_BUFFER_SIZE)
             file_to_close.seek(0)
-            bucket.upload_fileobj(file_to_close, path)
+            self.s3.meta.client.upload_fileobj(file_to_close, self.bucket, path, Config=get_s3_transfer_config())
 
     def list(self, path):
         logger.debug('Listing %s', path)
-        bucket = get_s3_bucket(self, self.bucket)
         path = path.rstrip('/')
+        # the client paginator avoids building a resource object per key
+        paginator = self.s3.meta.client.get_paginator('list_objects_v2')
         try:
-            for obj in bucket.objects.filter(Prefix=path):
-                if not obj.key.endswith('/'):
-                    yield obj.e_tag, obj.key
+            for page in paginator.paginate(Bucket=self.bucket, Prefix=path):
+                for obj in page.get('Contents', []):
+                    if not obj['Key'].endswith('/'):
+                        yield obj['ETag'], obj['Key']
         except ClientError as e:
             if e.response['Error']['Code'] == 'NoSuchBucket':
                 logger.warning('Bucket does not exist, list() returning empty.')
             else:
                 raise
 
+    def stat(self, path):
+        logger.debug('Checking %s', path)
+        try:
+            response = self.s3.meta.client.head_object(Bucket=self.bucket, Key=path)
+        except ClientError as e:
+            # head requests have no body, a missing bucket is reported as a plain 404 too
+            if e.response['Error']['Code'] in ('404', 'NoSuchKey', 'NoSuchBucket'):
+                return None
+            raise
+        return response['ETag'], response['ContentLength']
+
 
 @lru_cache()
 def get_gcs_bucket(_storage, bucket):
@@ -244,12 +335,46 @@ class GCStorage(BaseStorage):
             if not obj.name.endswith('/'):
                 yield obj.crc32c, obj.name
 
+    def stat(self, path):
+        logger.debug('Checking %s', path)
+        bucket = get_gcs_bucket(self, self.bucket)
+        blob = bucket.get_blob(path)
+        if blob is None:
+            return None
+        return blob.crc32c, blob.size
+
+
+def scan_files(root):
+    """
+    Yields the paths of all files under root, in the same order and with the same symlink
+    handling as os.walk(), but reusing the entries from os.scandir() instead of joining and
+    stating paths again.
+    """
+    dirs = []
+    try:
+        entries = os.scandir(root)
+    except OSError:
+        # os.walk also skips folders it cannot read
+        return
+    with entries:
+        for entry in entries:
+            if entry.is_dir():
+                # like os.walk, symlinks to folders are not followed
+                if not entry.is_symlink():
+                    dirs.append(entry.path)
+            else:
+                yield entry.path
+    for folder in dirs:
+        yield from scan_files(folder)
+
 
 class LocalStorage(BaseStorage):
     def __init__(self, root='/', hash_method=None, **kwargs):
         super().__init__(**kwargs)
         self.root = root
         self.hash_method = hash_method
+        # path -> ((mtime, size), hash), push lists the same local files more than once
+        self._hashes = {}
 
     def build_path(self, path):
         path = path.lstrip('/')
@@ -259,7 +384,8 @@ class LocalStorage(BaseStorage):
         try:
             stream = stream or BytesIO()
             with open(path, 'rb') as f:
-                stream.write(f.read())
+                # copying in chunks, the whole file never needs to be in memory at once
+                copyfileobj(f, stream, COPY_BUFFER_SIZE)
             stream.seek(0)
             return stream
         except FileNotFoundError:
@@ -271,16 +397,38 @@ class LocalStorage(BaseStorage):
     def write(self, f, path):
         Path(path).parent.mkdir(parents=True, exist_ok=True)
         f.seek(0)
-        copyfileobj(f, open(path, 'wb'))
+        with open(path, 'wb') as target:
+            copyfileobj(f, target, COPY_BUFFER_SIZE)
+
+    def _hash(self, path):
+        if not self.hash_method:
+            return None
+        path = str(path)
+        with open(path, 'rb') as f:
+            stat = os.fstat(f.fileno())
+            key = (stat.st_mtime_ns, stat.st_size)
+            cached = self._hashes.get(path)
+            if cached and cached[0] == key:
+                return cached[1]
+            file_hash = self.hash_method(f)
+        self._hashes[path] = (key, file_hash)
+        return file_hash
 
     def list(self, path):
         path = Path(path)
         if path.is_dir():
-            for root, dirs, files in os.walk(path):
-                for file in files:
-                    file_hash = self.hash_method(open(Path(root).joinpath(file), 'rb')) if self.hash_method else None
-                    yield file_hash, str(Path(root).joinpath(file))
+            for file_path in scan_files(str(path)):
+                yield self._hash(file_path), file_path
         else:
             # only yields if it exists
             if path.exists():
-                yield self.hash_method(open(path, 'rb')) if self.hash_method else None, str(path)
+                yield self._hash(path), str(path)
+
+    def stat(self, path):
+        try:
+            file_stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+        if not S_ISREG(file_stat.st_mode):
+            return None
+        return self._hash(path), file_stat.st_size
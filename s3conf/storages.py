@@ -1,20 +1,22 @@
 import os
-import codecs
+import re
 import logging
 import difflib
 from concurrent.futures import ThreadPoolExecutor
 from shutil import copyfileobj
-from pathlib import Path
 from functools import lru_cache
 
-import editor
-
-from .storage.storages import S3Storage, GCStorage, LocalStorage, s3etag
+from . import patch
+from .storage.storages import S3Storage, GCStorage, LocalStorage, s3etag, scan_files, COPY_BUFFER_SIZE
 from .storage.files import File
 from .storage.exceptions import FileDoesNotExist
 
 logger = logging.getLogger(__name__)
-__escape_decoder = codecs.getdecoder('unicode_escape')
+# characters that unicode-escape would change: anything outside printable ascii, and backslashes
+_ESCAPED_CHARS = re.compile(r'[^ -~]|\\')
+
+# files of a mapped folder are copied in parallel, all workers sharing the same storage client
+COPY_MAX_WORKERS = 16
 
 
 def parse_env_var(value):
@@ -28,10 +30,13 @@ def parse_env_var(value):
     k, _, v = value.partition('=')
 
     # Remove any leading and trailing spaces in key, value
-    k, v = k.strip(), v.strip().encode('unicode-escape').decode('ascii')
+    k, v = k.strip(), v.strip()
 
     if v and v[0] == v[-1] in ['"', "'"]:
-        v = __escape_decoder(v[1:-1])[0]
+        # escaping and then unescaping the quoted text gives it back unchanged
+        return k, v[1:-1]
+    if _ESCAPED_CHARS.search(v):
+        v = v.encode('unicode-escape').decode('ascii')
     return k, v
 
 
@@ -65,6 +70,7 @@ def get_s3_storage(settings, file_class, bucket):
         region_name=settings.get('S3CONF_S3_REGION_NAME') or settings.get('AWS_S3_REGION_NAME'),
         use_ssl=settings.get('S3CONF_S3_USE_SSL') or settings.get('AWS_S3_USE_SSL', True),
         endpoint_url=settings.get('S3CONF_S3_ENDPOINT_URL') or settings.get('AWS_S3_ENDPOINT_URL'),
+        max_pool_connections=settings.get('S3CONF_S3_MAX_POOL_CONNECTIONS'),
         file_class=file_class,
         bucket=bucket,
     )
@@ -80,8 +86,9 @@ def get_gs_storage(settings, file_class, bucket):
 
 
 def list_all_files(path):
-    if Path(path).is_dir():
-        mapping = iter(str(Path(root).joinpath(name).resolve()) for root, _, names in os.walk(path) for name in names)
+    if os.path.isdir(path):
+        # resolving only the top folder, scandir entries already carry their paths and file types
+        mapping = scan_files(os.path.realpath(path))
     else:
         mapping = [str(path)]
     return mapping
@@ -154,34 +161,36 @@ class StorageMapper:
         _, _, source_file = partition_path(source_file)
         _, _, target_file = partition_path(target_file)
         with source.open(source_file) as source_stream, target.open(target_file, 'wb') as target_stream:
-            copyfileobj(source_stream, target_stream)
+            copyfileobj(source_stream, target_stream, COPY_BUFFER_SIZE)
 
     def copy(self, source_path, target_path, force=False):
         final_state, copy_list = self.prepare_copy_list(source_path, target_path, force)
         source = self.storage(source_path)
         target = self.storage(target_path)
 
-        with ThreadPoolExecutor() as executor:
-            for _, source_file, target_file in copy_list:
+        with ThreadPoolExecutor(max_workers=COPY_MAX_WORKERS) as executor:
+            futures = [
                 executor.submit(self._copy, source, target, source_file, target_file)
+                for _, source_file, target_file in copy_list
+            ]
+            # surfacing errors from the workers
+            for future in futures:
+                future.result()
 
         return final_state
 
 
 class BaseFile(File):
     def exists(self):
-        if list(self.storage.list(self.name)):
-            return True
-        return False
+        return self.storage.stat(self.name) is not None
 
     def md5(self, raise_if_not_exists=True):
-        try:
-            md5hash, _ = next(self.storage.list(self.name))
-        except StopIteration:
+        file_stat = self.storage.stat(self.name)
+        if file_stat is None:
             if raise_if_not_exists:
                 raise FileDoesNotExist(self.name)
-            else:
-                md5hash = None
+            return None
+        md5hash, _ = file_stat
         return md5hash
 
     def diff(self, file_stream, fromfile='remote', tofile='local', **kwargs):
@@ -199,10 +208,14 @@ class BaseFile(File):
     def edit(self):
         self.seek(0)
         original_data = self.read()
-        edited_data = editor.edit(contents=original_data)
+        edited_data = patch.get_editor_module().edit(contents=original_data).decode()
+        if edited_data == original_data:
+            logger.debug('No changes made to %s', self.name)
+            self.mark_clean()
+            return
         self.seek(0)
         self.truncate()
-        self.write(edited_data.decode())
+        self.write(edited_data)
 
 
 class EnvFile(BaseFile):
@@ -213,9 +226,12 @@ class EnvFile(BaseFile):
 
     def as_dict(self):
         self.seek(0)
-        lines = self.read().splitlines()
-        lines = [line for line in lines if line and not line.startswith('#') and '=' in line]
-        env_dict = dict(parse_env_var(line) for line in lines)
+        env_dict = {}
+        # iterating the file parses line by line, without a copy of the whole content in memory
+        for line in self.file:
+            if not line.startswith('#') and '=' in line:
+                key, value = parse_env_var(line)
+                env_dict[key] = value
         return env_dict
 
     def set(self, value):
@@ -223,8 +239,10 @@ class EnvFile(BaseFile):
         new_lines = []
         value_set = False
         self.seek(0)
-        for line in self.read().splitlines():
-            key, value = parse_env_var(line)
+        for line in self.file:
+            line = line.rstrip('\n')
+            # only the key is compared, the value does not need to be unescaped
+            key = line.partition('=')[0].strip()
             if key == new_key:
                 new_lines.append('{}={}'.format(new_key, new_value))
                 value_set = True
@@ -242,8 +260,9 @@ class EnvFile(BaseFile):
         unset_done = False
         try:
             self.seek(0)
-            for line in self.read().splitlines():
-                key, value = parse_env_var(line)
+            for line in self.file:
+                line = line.rstrip('\n')
+                key = line.partition('=')[0].strip()
                 if key == unset_key:
                     unset_done = True
                     continue
@@ -261,11 +280,8 @@ class EnvFile(BaseFile):
             logger.info('Key %s not found in environemnt file, doing nothing...', unset_key)
 
     def from_dict(self, env_vars):
-        file_data = ''
-        for var_name, var_value in env_vars.items():
-            file_data += '{}={}\n'.format(var_name, var_value)
         self.truncate()
-        self.write(file_data)
+        self.writelines(f'{var_name}={var_value}\n' for var_name, var_value in env_vars.items())
 
     def update(self, another_file):
         env_vars = self.as_dict()
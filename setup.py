@@ -65,7 +65,7 @@ setup(
     packages=get_packages(package),
     package_data=get_package_data(package),
     install_requires=[
-        'click>=6.7',
+        'click~=7.0',
         'python-editor>=1.0.3',
         'click-log>=0.2.1',
         'configobj>=5.0.6'
@@ -6,10 +6,13 @@ from pathlib import Path
 
 import pytest
 from botocore.exceptions import ClientError
+from click.testing import CliRunner
 
 import s3conf.storages
 from s3conf import exceptions
-from s3conf import config, s3conf
+from s3conf import config, client, s3conf
+from s3conf.storage.storages import LocalStorage
+from s3conf.storages import EnvFile
 
 logging.getLogger('boto3').setLevel(logging.ERROR)
 logging.getLogger('botocore').setLevel(logging.ERROR)
@@ -70,6 +73,9 @@ def test_etag():
         file_list = list(storage.list('remote/file1.txt'))
         file = conf.storages.storage(local_path).open(local_path)
         assert file.md5() == file_list[0][0]
+        assert storage.stat('remote/file1.txt') == (file_list[0][0], 5)
+        # a prefix of an existing key is not a file
+        assert storage.stat('remote/file1') is None
 
 
 def test_copy_list():
@@ -124,6 +130,68 @@ def test_add_rm():
                           's3://s3conf/files/subfolder:subfolder'
 
 
+def test_add_rm_outside_root():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        config_file, _ = _setup_basic_test(temp_dir)
+        runner = CliRunner()
+        for command in ('add', 'rm'):
+            result = runner.invoke(client.main, [command, 'test', '../outside'])
+            assert result.exit_code == 2
+            assert 'is outside the project root' in result.output
+        assert config.Settings(section='test', config_file=config_file).serialize_mappings() == \
+            's3://s3conf/files/file1.txt:file1.txt;s3://s3conf/files/subfolder:subfolder'
+
+
+def test_add_rm_symlink_into_root():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        config_file, _ = _setup_basic_test(temp_dir)
+        open('linked.txt', 'w').write('linked')
+        link_path = os.path.join(temp_dir, 'link.txt')
+        os.symlink(os.path.realpath('linked.txt'), link_path)
+        runner = CliRunner()
+
+        # the link itself is outside the project root, the file it points to is not
+        result = runner.invoke(client.main, ['add', 'test', link_path])
+        assert result.exit_code == 0
+        assert config.Settings(section='test', config_file=config_file).serialize_mappings() == \
+            's3://s3conf/files/file1.txt:file1.txt;s3://s3conf/files/subfolder:subfolder;' \
+            's3://s3conf/files/linked.txt:linked.txt'
+
+        result = runner.invoke(client.main, ['rm', 'test', link_path])
+        assert result.exit_code == 0
+        assert config.Settings(section='test', config_file=config_file).serialize_mappings() == \
+            's3://s3conf/files/file1.txt:file1.txt;s3://s3conf/files/subfolder:subfolder'
+
+
+def test_mappings_round_trip():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        config_file = Path(temp_dir).joinpath(f'{config.CONFIG_NAME}.ini')
+        open(config_file, 'w').write(
+            '[test]\n'
+            'S3CONF_MAP=s3://s3conf/a:./a/;s3://s3conf/b:a//b;s3://s3conf/root:.;'
+            's3://s3conf/c:/c/d;s3://s3conf/e:a/../e\n'
+        )
+        settings = config.Settings(section='test', config_file=config_file)
+        root_folder = settings.root_folder
+        assert settings.file_mappings == {
+            os.path.join(root_folder, 'a'): 's3://s3conf/a',
+            os.path.join(root_folder, 'a/b'): 's3://s3conf/b',
+            root_folder: 's3://s3conf/root',
+            os.path.join(root_folder, 'c/d'): 's3://s3conf/c',
+            # like pathlib, ".." is not collapsed
+            os.path.join(root_folder, 'a/../e'): 's3://s3conf/e',
+        }
+        assert settings.serialize_mappings() == 's3://s3conf/a:a;s3://s3conf/b:a/b;s3://s3conf/root:.;' \
+                                                's3://s3conf/c:c/d;s3://s3conf/e:a/../e'
+
+        # the same paths written differently are the same mappings
+        settings.rm_mapping('a')
+        settings.rm_mapping('./a/b/')
+        settings.rm_mapping('./')
+        settings.add_mapping('s3://s3conf/c2', 'c//d')
+        assert settings.serialize_mappings() == 's3://s3conf/c2:c/d;s3://s3conf/e:a/../e'
+
+
 def test_diff():
     with tempfile.TemporaryDirectory() as temp_dir:
         _setup_basic_test(temp_dir)
@@ -291,3 +359,128 @@ def test_set_unset_env_var():
 
             env_vars = env_file.as_dict()
             assert 'TEST' not in env_vars
+
+
+def test_config_file_parse_cache():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        config_file = str(Path(temp_dir).joinpath(f'{config.CONFIG_NAME}.ini'))
+        open(config_file, 'w').write('[test]\nTEST=123\n')
+        resolver = config.ConfigFileResolver(config_file, section='test')
+        assert resolver.get('TEST') == '123'
+        assert config.ConfigFileResolver(config_file).config is resolver.config
+
+        # changes are not visible to other resolvers until saved
+        resolver.set('TEST', '456')
+        assert config.ConfigFileResolver(config_file, section='test').get('TEST') == '123'
+        resolver.save()
+        assert config.ConfigFileResolver(config_file, section='test').get('TEST') == '456'
+
+
+def test_config_file_unsaved_changes_are_private():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        config_file = str(Path(temp_dir).joinpath(f'{config.CONFIG_NAME}.ini'))
+        open(config_file, 'w').write('[test]\nTEST=123\n')
+        reader = config.ConfigFileResolver(config_file, section='test')
+        writer = config.ConfigFileResolver(config_file, section='test')
+        assert reader.get('TEST') == '123'
+        assert writer.get('TEST') == '123'
+
+        # the reader was created and parsed first, it keeps seeing the file contents
+        writer.set('TEST', '456')
+        assert writer.get('TEST') == '456'
+        assert reader.get('TEST') == '123'
+        assert open(config_file).read() == '[test]\nTEST=123\n'
+
+
+def test_frozen_help_is_up_to_date():
+    # if this fails, run "python -m s3conf._help_regen"
+    from s3conf import _help, _help_regen
+    assert _help.HELP == _help_regen.render_help() + '\n'
+
+
+def test_phusion_dump():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        dump_path = Path(temp_dir).joinpath('container_environment')
+        s3conf.phusion_dump({'TEST': '123', 'TEST2': 'a b'}, str(dump_path))
+        assert open(dump_path.joinpath('TEST')).read() == '123\n'
+        assert open(dump_path.joinpath('TEST2')).read() == 'a b\n'
+
+
+def test_local_storage_hash_cache():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        file_path = os.path.join(temp_dir, 'file')
+        open(file_path, 'w').write('content')
+        calls = []
+
+        def hash_method(f):
+            calls.append(f.name)
+            return f.read()
+
+        storage = LocalStorage(root=temp_dir, hash_method=hash_method)
+        assert list(storage.list(file_path)) == [(b'content', file_path)]
+        assert list(storage.list(file_path)) == [(b'content', file_path)]
+        assert len(calls) == 1
+
+        open(file_path, 'w').write('new content')
+        assert list(storage.list(file_path)) == [(b'new content', file_path)]
+        assert len(calls) == 2
+
+
+def test_edit_without_changes_does_not_write(monkeypatch):
+    class Editor:
+        @staticmethod
+        def edit(contents):
+            return contents.encode()
+
+    monkeypatch.setattr('s3conf.patch.get_editor_module', lambda: Editor)
+    with tempfile.TemporaryDirectory() as temp_dir:
+        file_path = os.path.join(temp_dir, 'test.env')
+        open(file_path, 'w').write('TEST=123\n')
+        storage = LocalStorage(root=temp_dir, file_class=EnvFile)
+        writes = []
+        monkeypatch.setattr(storage, 'write', lambda f, path: writes.append(path))
+        with storage.open(file_path, 'r+') as env_file:
+            env_file.edit()
+        assert writes == []
+
+
+def test_exec_passes_argv_through():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        _setup_basic_test(temp_dir)
+        s3conf.S3Conf(settings=config.Settings(section='test')).create_envfile()
+        runner = CliRunner()
+
+        # every argument reaches the command as it was given, none of them is split again
+        result = runner.invoke(client.main, ['exec', 'test', '--no-exec-replace', '--',
+                                             'sh', '-c', 'test "$1" = "a b"', 'sh', 'a b'])
+        assert result.exit_code == 0
+
+        # a quoted command line is the name of the program
+        result = runner.invoke(client.main, ['exec', 'test', '--no-exec-replace', '--', 'sh -c "exit 0"'])
+        assert isinstance(result.exception, FileNotFoundError)
+
+
+def test_exec_no_exec_replace_exit_codes():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        _setup_basic_test(temp_dir)
+        s3conf.S3Conf(settings=config.Settings(section='test')).create_envfile()
+        runner = CliRunner()
+
+        result = runner.invoke(client.main, ['exec', 'test', '--no-exec-replace', '--', 'sh', '-c', 'exit 3'])
+        assert result.exit_code == 3
+        # like a shell, a child killed by a signal exits with 128 + the signal number
+        result = runner.invoke(client.main, ['exec', 'test', '--no-exec-replace', '--', 'sh', '-c', 'kill -TERM $$'])
+        assert result.exit_code == 143
+
+
+def test_spawn_and_wait_restores_signals():
+    # python ignores SIGPIPE and SIGXFSZ, the child gets their default action back
+    assert client._spawn_and_wait(['sh', '-c', 'kill -PIPE $$'], os.environ) == 141
+    assert client._spawn_and_wait(['sh', '-c', 'kill -XFSZ $$'], os.environ) == 153
+
+
+def test_spawn_and_wait_without_posix_spawnp(monkeypatch):
+    monkeypatch.delattr(os, 'posix_spawnp')
+    assert client._spawn_and_wait(['sh', '-c', 'exit 3'], os.environ) == 3
+    assert client._spawn_and_wait(['sh', '-c', 'kill -TERM $$'], os.environ) == 143
+    assert client._spawn_and_wait(['sh', '-c', 'kill -PIPE $$'], os.environ) == 141